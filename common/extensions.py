@@ -22,11 +22,9 @@ class QueryExecutionTimeExtension(Extension):
         self.start_timestamp = None
 
     def request_started(self, context: ContextValue) -> None:
-        self.start_timestamp = time.perf_counter_ns()
+        self.start_timestamp = time.perf_counter()
 
     def format(self, context):
-        if self.start_timestamp:
-            exec_time_in_secs = round(
-                (time.perf_counter_ns() - self.start_timestamp) / 1000000000, 2
-            )
+        if self.start_timestamp is not None:
+            exec_time_in_secs = round(time.perf_counter() - self.start_timestamp, 2)
             return {"execution_time_in_seconds": exec_time_in_secs}
@@ -11,55 +11,200 @@
    See the License for the specific language governing permissions and
    limitations under the License.
 """
+from typing import List, Tuple
 import vcfpy
+import pysam
 import json
 import os
 import glob
+import logging
+import re
+import threading
+from collections import OrderedDict
 from common.file_model.variant import Variant
 
+VARIANT_ID_PATTERN = re.compile(r"([^:]+):(\d+):(.+)")
+
+logger = logging.getLogger(__name__)
+
 class FileClient:
     """
     Client to load file in-memory
     """
+    # Upper bound on the number of datafiles kept open at once
+    MAX_OPEN_READERS = 32
+    # Upper bound on the number of parsed variants kept across requests
+    MAX_CACHED_VARIANTS = 4096
+
     def __init__(self, config):
         self.data_root = config.get("data_root")
-        
+        self._readers = OrderedDict()
+        self._readers_lock = threading.Lock()
+        self._variants = OrderedDict()
+        self._variants_lock = threading.Lock()
+
+    def _get_reader(self, datafile: str):
+        """
+        Returns an open (reader, tabix, lock) for datafile, reopening it if the file has changed
+        """
+        mtime = os.stat(datafile).st_mtime_ns
+        with self._readers_lock:
+            cached = self._readers.get(datafile)
+            if cached is not None and cached[3] == mtime:
+                self._readers.move_to_end(datafile)
+                return cached[:3]
+
+        # opening a file is slow, so lookups for other files are not held up by it
+        reader = vcfpy.Reader.from_path(datafile)
+        try:
+            tabix = pysam.TabixFile(datafile)
+        except OSError:
+            reader.close()
+            raise
+        lock = threading.Lock()
+
+        stale = []
+        with self._readers_lock:
+            cached = self._readers.get(datafile)
+            if cached is not None and cached[3] == mtime:
+                # another thread opened it in the meantime
+                self._readers.move_to_end(datafile)
+                stale.append((reader, tabix, lock))
+                reader, tabix, lock = cached[:3]
+            else:
+                if cached is not None:
+                    stale.append(cached[:3])
+                self._readers[datafile] = (reader, tabix, lock, mtime)
+                while len(self._readers) > self.MAX_OPEN_READERS:
+                    stale.append(self._readers.popitem(last=False)[1][:3])
+
+        # wait for any thread still reading a dropped file before closing it;
+        # _lock_reader retries if it picked up the handles in the meantime
+        for stale_reader, stale_tabix, stale_lock in stale:
+            with stale_lock:
+                stale_reader.close()
+                stale_tabix.close()
+        return reader, tabix, lock
     
+    def _lock_reader(self, datafile: str):
+        """
+        Returns (reader, tabix, lock) for datafile with lock acquired; the caller releases it
+        """
+        while True:
+            reader, tabix, lock = self._get_reader(datafile)
+            lock.acquire()
+            # another thread may have closed the handles before the lock was taken
+            if tabix.is_open():
+                return reader, tabix, lock
+            lock.release()
+
+    def _get_cached_variant(self, datafile: str, tabix, key: Tuple):
+        """
+        Get a cached variant, or None if it was read before the file was reopened
+        """
+        with self._variants_lock:
+            cached = self._variants.get((datafile, key))
+            if cached is None:
+                return None
+            if cached[0] is not tabix:
+                del self._variants[(datafile, key)]
+                return None
+            self._variants.move_to_end((datafile, key))
+            return cached[1]
+
+    def _cache_variant(self, datafile: str, tabix, key: Tuple, variant: Variant) -> None:
+        """
+        Cache a variant, evicting the least recently used one
+        """
+        with self._variants_lock:
+            self._variants[(datafile, key)] = (tabix, variant)
+            self._variants.move_to_end((datafile, key))
+            if len(self._variants) > self.MAX_CACHED_VARIANTS:
+                self._variants.popitem(last=False)
+
     def get_variant_record(self, genome_uuid: str, variant_id: str):
         """
         Get a variant entry from variant_id
         """
+        return self.get_variant_records(genome_uuid, [variant_id])[0]
+
+    def get_variant_records(self, genome_uuid: str, variant_ids: List[str]) -> List:
+        """
+        Get variant entries for a list of variant_ids, in the same order
+        """
+        keys = []
+        for variant_id in variant_ids:
+            try: 
+                keys.append(self.split_variant_id(variant_id))
+            except ValueError:
+                logger.debug("Invalid variant_id %s, expected the format contig:position:identifier", variant_id)
+                keys.append(None)
+
         datafile = os.path.join(self.data_root, genome_uuid, "variation.vcf.gz")
-        if datafile:
-            self.collection = vcfpy.Reader.from_path(datafile)
-            self.header = self.collection.header
-        else:
-            print("Please check the directory path for the given genome uuid")
-
-        try: 
-            [contig, pos, id] = self.split_variant_id(variant_id)
-            pos = int(pos)
-        except:
-            #TODO: This needs to go to thoas logger
-            #TODO: Exception needs to be caught appropriately
-            print("Please check that the variant_id is in the format: contig:position:identifier")
-        data = {}
-        variant = None
         try:
-            for rec in self.collection.fetch(contig, pos-1, pos):
-                if rec.ID[0] == id:
-                    variant = Variant(rec, self.header, genome_uuid)
-                    break
-            return variant
-        except:
-            # Return None when variant cannot be fetched
-            return
-        
+            reader, tabix, lock = self._lock_reader(datafile)
+        except OSError as error:
+            # e.g. no variation file for the genome, or its tabix index is missing
+            logger.warning("Cannot open variation file for genome %s at %s: %s", genome_uuid, datafile, error)
+            return [None] * len(variant_ids)
+
+        try:
+            header = reader.header
+            variants = {}
+            ids_by_location = {}
+            for key in keys:
+                if key is None or key in variants:
+                    continue
+                variant = self._get_cached_variant(datafile, tabix, key)
+                if variant is not None:
+                    variants[key] = variant
+                else:
+                    contig, pos, id = key
+                    ids_by_location.setdefault((contig, pos), set()).add(id)
+
+            # visiting locations in ascending position within each contig keeps
+            # consecutive fetches on the same or neighbouring compressed blocks
+            for (contig, pos), ids in sorted(ids_by_location.items()):
+                try:
+                    lines = tabix.fetch(region=f"{contig}:{pos}-{pos}")
+                except ValueError:
+                    # the contig is not in the file
+                    continue
+                # Match on the raw POS and ID columns and only hand matching
+                # lines to vcfpy, so records sharing the window are never
+                # fully parsed. Records overlapping pos but starting before
+                # it (long deletions) are skipped without looking at their ID.
+                remaining = set(ids)
+                for line in lines:
+                    line_pos, line_id = self._split_line_location(line)
+                    if line_pos == pos and line_id in remaining:
+                        rec = reader.parser.parse_line(line)
+                        variant = Variant(rec, header, genome_uuid)
+                        variants[(contig, pos, line_id)] = variant
+                        self._cache_variant(datafile, tabix, (contig, pos, line_id), variant)
+                        remaining.discard(line_id)
+                        if not remaining:
+                            break
+        finally:
+            lock.release()
+
+        return [variants.get(key) for key in keys]
         
+    def _split_line_location(self, line: str) -> Tuple[int, str]:
+        """
+        Returns the POS and first ID of a raw VCF data line
+        """
+        _, line_pos, line_id, _ = line.split("\t", 3)
+        return int(line_pos), line_id.split(";", 1)[0]
+
     def split_variant_id(self, variant_id: str):
         """
-        Splits variant_id into separate fields
+        Splits variant_id into (contig, position, identifier)
         """
-        return variant_id.split(":")
+        match = VARIANT_ID_PATTERN.fullmatch(variant_id)
+        if match is None:
+            raise ValueError(f"Invalid variant_id: {variant_id}")
+        contig, pos, id = match.groups()
+        return contig, int(pos), id
 
 
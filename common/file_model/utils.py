@@ -19,7 +19,6 @@ def minimise_allele(alt: str, ref:str) -> str:
         for prediction scores in INFO column. This function is useful
         in matching the SPDI format in VCF with the allele in memory
         """
-        minimised_allele_string = alt
-        if ref[0] == alt[0]:
-            minimised_allele_string = alt[1:] if len(alt) > 1 else "-"
-        return minimised_allele_string
\ No newline at end of file
+        if ref[0] != alt[0]:
+            return alt
+        return alt[1:] or "-"
\ No newline at end of file
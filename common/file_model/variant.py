@@ -12,26 +12,107 @@
    limitations under the License.
 """
 
-from typing import Any, Mapping, List, Union
+from typing import Any, Mapping, List, Union, Tuple
 import re
 import os
+import weakref
 import json
-import operator
-from functools import reduce
+from functools import lru_cache
 from common.file_model.variant_allele import VariantAllele
 from common.file_model.utils import minimise_allele
 
+with open(os.path.join(os.path.dirname(__file__), 'variation_consequence_rank.json')) as rank_file:
+    CONSEQUENCE_RANK = {consequence: int(rank) for consequence, rank in json.load(rank_file).items()}
+
+with open(os.path.join(os.path.dirname(__file__), 'populations.json')) as pop_file:
+    POPULATIONS = json.load(pop_file)
+POPULATION_NAMES = [sub_pop["name"] for pop in POPULATIONS.values() for sub_pop in pop]
+
+VEP_VERSION_PATTERN = re.compile(r"v\d+")
+SOURCE_INFO_PATTERN = re.compile(r'(.+?)="(.+?)"\s*')
+
+# Indexed by the bits (alt is 1bp, ref is 1bp, ref and alt have equal length);
+# None marks combinations that cannot occur
+ALLELE_TYPES = (
+    ("indel", "SO:1000032"),            # 0b000
+    ("substitution", "SO:1000002"),     # 0b001
+    ("insertion", "SO:0000667"),        # 0b010
+    None,                               # 0b011
+    ("deletion", "SO:0000159"),         # 0b100
+    None,                               # 0b101
+    None,                               # 0b110
+    ("SNV", "SO:0001483"),              # 0b111
+)
+
+@lru_cache(maxsize=None)
+def get_format_indices(info_description: str) -> Mapping:
+    """
+    Maps each column in the Format of an INFO description to its index
+    """
+    format_indices = {}
+    for index, value in enumerate(info_description.split("Format: ")[1].split("|")):
+        format_indices.setdefault(value, index)
+    return format_indices
+
+# The payloads below and the values returned by the cached helpers in this module
+# (payloads, CSQ index maps) are shared between variants and must not be mutated
+DIRECT_ASSIGNMENT_METHOD = {
+    "type": "DIRECT",
+    "description": "A reference made by an external resource of annotation to an Ensembl feature that Ensembl imports without modification"
+}
+
+SEQUENCE_ONTOLOGY_SOURCE = {
+    "id": "",
+    "name": "Sequence Ontology",
+    "url": "www.sequenceontology.org",
+    "description": "The Sequence Ontology..."
+}
+
+# CSQ columns read by VariantAllele when building its consequences and predictions
+CSQ_ALLELE_COLUMNS = ("Allele", "PHENOTYPES", "Feature_type", "Feature", "Consequence",
+                      "SIFT", "PolyPhen", "SPDI", "CADD_PHRED","Conservation", "Gene", "SYMBOL",
+                      "BIOTYPE","cDNA_position", "CDS_position", "Protein_position", "Amino_acids", "Codons")
+
+@lru_cache(maxsize=None)
+def get_allele_type_payload(allele_type: str, SO_term: str) -> Mapping:
+    """
+    Allele type payload, shared by all variants
+    """
+    return {
+        "accession_id": allele_type,
+        "value": allele_type,
+        "url": f"http://sequenceontology.org/browser/current_release/term/{SO_term}",
+        "source": SEQUENCE_ONTOLOGY_SOURCE
+    }
+
+FORWARD_STRAND = {
+    "code": "forward",
+    "value": 1
+}
+
+@lru_cache(maxsize=None)
+def get_region_payload(chromosome: str) -> Mapping:
+    """
+    Region payload, shared by every slice on a chromosome
+    """
+    return {
+        "name": chromosome,
+        "code": "chromosome",
+        "topology": "linear",
+        "so_term": "SO:0001217"
+    }
+
 def reduce_allele_length(allele_list: List):
-    allele_length = -1
-    for allele in allele_list:
-        if len(allele.value) > allele_length:
-            allele_length = len(allele.value)
-    return allele_length
+    return max((len(allele.value) for allele in allele_list), default=-1)
 
 
 
 class Variant ():
+    __slots__ = ("genome_uuid", "name", "record", "header", "chromosome", "position",
+                 "alts", "ref", "ref_length", "info", "type", "vep_version", "population_map",
+                 "allele_types", "slices", "variant_alleles")
     variant_sources = {}       ## used to cache source information, class attribute
+    header_values = {}         ## used to cache values parsed from each file header (VEP version, source, primary source fields, CSQ indices), class attribute; entries are dropped with their header
 
     def __init__(self, record: Any, header: Any, genome_uuid: str) -> None:
         self.genome_uuid = genome_uuid
@@ -42,14 +123,63 @@ class Variant ():
         self.position = record.POS
         self.alts = record.ALT
         self.ref = record.REF
+        self.ref_length = len(record.REF)
         self.info = record.INFO
         self.type = "Variant"
-        self.vep_version = re.search("v\d+", self.header.get_lines("VEP")[0].value).group()
-        self.population_map = {}
+        self.vep_version = self.get_vep_version()
+        # set_frequency_flags result, computed on first use
+        self.population_map = None
+        # get_allele_type and get_slice results, keyed by allele (None for all alts)
+        self.allele_types = {}
+        self.slices = {}
+        # get_alleles result, built on first use
+        self.variant_alleles = None
     
     def get_alternative_names(self) -> List:
         return []
+
+    def get_header_values(self) -> Mapping:
+        """
+        Returns the cache of values parsed from this variant's file header
+        """
+        header_key = id(self.header)
+        if header_key not in self.header_values:
+            self.header_values[header_key] = {}
+            weakref.finalize(self.header, self.header_values.pop, header_key, None)
+        return self.header_values[header_key]
+
+    def get_vep_version(self) -> str:
+        """
+        Parses the VEP version from the header once per file header
+        """
+        header_values = self.get_header_values()
+        if "vep_version" not in header_values:
+            header_values["vep_version"] = VEP_VERSION_PATTERN.search(self.header.get_lines("VEP")[0].value).group()
+        return header_values["vep_version"]
+
+    def get_default_source(self) -> str:
+        """
+        Reads the first source line from the header once per file header
+        """
+        header_values = self.get_header_values()
+        if "source" not in header_values:
+            header_values["source"] = self.header.get_lines("source")[0].value
+        return header_values["source"]
     
+    def get_csq_index_map(self) -> Mapping:
+        """
+        Maps the CSQ_ALLELE_COLUMNS in the header, lower-cased, to their CSQ record index
+        """
+        header_values = self.get_header_values()
+        if "csq_index_map" not in header_values:
+            csq_index_map = {}
+            for col in CSQ_ALLELE_COLUMNS:
+                col_index = self.get_info_key_index(col)
+                if col_index is not None:
+                    csq_index_map[col.lower()] = col_index
+            header_values["csq_index_map"] = csq_index_map
+        return header_values["csq_index_map"]
+
     def parse_source_from_header(self) -> Mapping:
         genome_uuid = self.genome_uuid
         if genome_uuid not in self.variant_sources:
@@ -60,7 +190,7 @@ class Variant ():
             source, source_info_line = source_header_line.value.split("\" ", 1)
             
             source = source.strip('"').replace(" ", "_")
-            source_info = dict(re.findall('(.+?)="(.+?)"\s*', source_info_line))
+            source_info = dict(SOURCE_INFO_PATTERN.findall(source_info_line))
 
             ## overwrite is allowed
             self.variant_sources[genome_uuid][source] = source_info
@@ -75,137 +205,122 @@ class Variant ():
             if "SOURCE" in self.info:
                 source = self.info["SOURCE"]
             else:
-                source = self.header.get_lines("source")[0].value
-
-            # Get source information from data file header header
-            genome_uuid = self.genome_uuid
-            if genome_uuid not in self.variant_sources or source not in self.variant_sources[genome_uuid]:     
-                self.parse_source_from_header()
-            variant_sources = self.variant_sources[genome_uuid]
-
-            if source in variant_sources:
-                source_info = variant_sources[source]
-
-                source_id = source
-                source_name = source.replace("_", " ")
-                source_description = source_info["description"] if "description" in source_info else ""
-                source_url = source_info["url"] if "url" in source_info else ""
-                source_release = source_info["version"] if "version" in source_info else ""
-
-                if "accession_url" in source_info:
-                    source_url_id = source_info["accession_url"]
-                    if re.search("^Ensembl", source):
-                        variant_id = f"{self.chromosome}:{self.position}:{self.name}"
-                    else:
-                        variant_id = self.name
-                else:
-                    source_url_id = source_url
-                    variant_id = ""
-            
-            # If source information not found in data file try using default value for main accessioning sources
-            elif re.search("^dbSNP", source):
-                source_id = "dbSNP"
-                source_name = "dbSNP"
-                source_description = "NCBI db of human variants"
-                source_url = "https://www.ncbi.nlm.nih.gov/snp/"
-                source_url_id = source_url
-                source_release = 156
-                variant_id = self.name
-            
-            elif re.search("^EVA", source):
-                source_id = "EVA"
-                source_name = "EVA"
-                source_description = "European Variation Archive"
-                source_url = "https://www.ebi.ac.uk/eva"
-                source_url_id = "https://www.ebi.ac.uk/eva/?variant&accessionID="
-                source_release = "release_6"
-                variant_id = self.name
-
-            elif re.search("^Ensembl", source):
-                source_id = "Ensembl"
-                source_name = "Ensembl"
-                source_description = "Ensembl"
-                source_url = "https://beta.ensembl.org"
-                source_url_id = "https://beta.ensembl.org/"
-                source_release = "110" # to be fetched from the file
-                variant_id = f"{self.chromosome}:{self.position}:{self.name}"
-            
+                source = self.get_default_source()
+
+            # Source details only depend on the source name, so they are
+            # resolved and the source payload is built once per file header and source
+            primary_sources = self.get_header_values().setdefault("primary_sources", {})
+            if source not in primary_sources:
+                (source_id, source_name, source_description, source_url,
+                    source_url_id, source_release, url_variant_id) = self.parse_primary_source(source)
+                primary_sources[source] = (
+                    source_description,
+                    {
+                        "id" : source_id,
+                        "name": source_name,
+                        "description": source_description,
+                        "url":  source_url,
+                        "release": str(source_release)
+                    },
+                    source_url_id,
+                    url_variant_id
+                )
+            source_description, source_payload, source_url_id, url_variant_id = primary_sources[source]
 
         except Exception as e:
             return None 
 
+        if url_variant_id == "location":
+            variant_id = f"{self.chromosome}:{self.position}:{self.name}"
+        elif url_variant_id == "name":
+            variant_id = self.name
+        else:
+            variant_id = ""
+
         return {
             "accession_id": self.name,
             "name": self.name,
-            "description": f"{source_description}",
-            "assignment_method": {
-                                "type": "DIRECT",
-                                "description": "A reference made by an external resource of annotation to an Ensembl feature that Ensembl imports without modification"
-                            },
+            "description": source_description,
+            "assignment_method": DIRECT_ASSIGNMENT_METHOD,
             "url": f"{source_url_id}{variant_id}",
-            "source": {
-
-                        "id" : f"{source_id}",
-                        "name": f"{source_name}",
-                        "description": f"{source_description}",
-                        "url":  f"{source_url}",
-                        "release": f"{source_release}"
-                        }
+            "source": source_payload
         }
 
-
-        
+    def parse_primary_source(self, source: str) -> Tuple:
+        """
+        Resolves the fields describing a source from the header or known defaults
+        """
+        # only called once per file header and source, so the header is
+        # re-read to pick up source lines changed by a data refresh
+        self.parse_source_from_header()
+        variant_sources = self.variant_sources[self.genome_uuid]
+
+        if source in variant_sources:
+            source_info = variant_sources[source]
+            source_url = source_info["url"] if "url" in source_info else ""
+            if "accession_url" in source_info:
+                source_url_id = source_info["accession_url"]
+                url_variant_id = "location" if source.startswith("Ensembl") else "name"
+            else:
+                source_url_id = source_url
+                url_variant_id = ""
+            return (
+                source,
+                source.replace("_", " "),
+                source_info["description"] if "description" in source_info else "",
+                source_url,
+                source_url_id,
+                source_info["version"] if "version" in source_info else "",
+                url_variant_id
+            )
+
+        # If source information not found in data file try using default value for main accessioning sources
+        elif source.startswith("dbSNP"):
+            return ("dbSNP", "dbSNP", "NCBI db of human variants", "https://www.ncbi.nlm.nih.gov/snp/",
+                    "https://www.ncbi.nlm.nih.gov/snp/", 156, "name")
+
+        elif source.startswith("EVA"):
+            return ("EVA", "EVA", "European Variation Archive", "https://www.ebi.ac.uk/eva",
+                    "https://www.ebi.ac.uk/eva/?variant&accessionID=", "release_6", "name")
+
+        elif source.startswith("Ensembl"):
+            # release to be fetched from the file
+            return ("Ensembl", "Ensembl", "Ensembl", "https://beta.ensembl.org",
+                    "https://beta.ensembl.org/", "110", "location")
+
+        raise ValueError(f"Unknown source: {source}")
 
     def set_allele_type(self, alt_one_bp: bool, ref_one_bp: bool, ref_alt_equal_bp: bool):         
-        match [alt_one_bp, ref_one_bp, ref_alt_equal_bp]:
-            case [True, True, True]: 
-                allele_type = "SNV" 
-                SO_term = "SO:0001483"
-
-            case [True, False, False]: 
-                allele_type = "deletion" 
-                SO_term = "SO:0000159"
-
-            case [False, True, False]: 
-                allele_type = "insertion"
-                SO_term = "SO:0000667"
-
-            case [False, False, False]: 
-                allele_type = "indel"
-                SO_term = "SO:1000032"
-
-            case [False, False, True]: 
-                allele_type = "substitution"
-                SO_term = "SO:1000002"   
-        return allele_type, SO_term
+        allele_type = ALLELE_TYPES[alt_one_bp << 2 | ref_one_bp << 1 | ref_alt_equal_bp]
+        if allele_type is None:
+            raise ValueError(f"No allele type for alt_one_bp={alt_one_bp}, ref_one_bp={ref_one_bp}, ref_alt_equal_bp={ref_alt_equal_bp}")
+        return allele_type
     
     def get_allele_type(self, allele: Union[str, List]) -> Mapping :
+        # A string is a single allele, a list is all the variant's alts
+        key = allele if isinstance(allele, str) else None
+        if key in self.allele_types:
+            return self.allele_types[key]
+
         if isinstance(allele, str):
             if allele == self.ref:
                 allele_type, SO_term = "biological_region","SO:0001411"
             else:
-                allele_type, SO_term = self.set_allele_type(len(allele)<2, len(self.ref)<2, len(allele) == len(self.ref))
+                allele_type, SO_term = self.set_allele_type(len(allele)<2, self.ref_length<2, len(allele) == self.ref_length)
         elif isinstance(allele, list):
             alt_length = reduce_allele_length(allele)
-            allele_type, SO_term = self.set_allele_type(alt_length < 2 , len(self.ref)<2, alt_length == len(self.ref))
+            allele_type, SO_term = self.set_allele_type(alt_length < 2 , self.ref_length<2, alt_length == self.ref_length)
 
-        return {
-            "accession_id": allele_type,
-            "value": allele_type,
-            "url": f"http://sequenceontology.org/browser/current_release/term/{SO_term}",
-            "source": {
-                    "id": "",
-                    "name": "Sequence Ontology",
-                    "url": "www.sequenceontology.org",
-                    "description": "The Sequence Ontology..."
-                    }
-
-        }  
+        self.allele_types[key] = get_allele_type_payload(allele_type, SO_term)
+        return self.allele_types[key]
     
     def get_slice(self, allele: Union[str, List] ) -> Mapping :
+        key = allele if isinstance(allele, str) else None
+        if key in self.slices:
+            return self.slices[key]
 
         start = self.position
-        length = len(self.ref)
+        length = self.ref_length
         end = start + length -1
         if allele != self.ref:
             allele_type = self.get_allele_type(allele)
@@ -213,51 +328,43 @@ class Variant ():
                 length = 0
                 end = start + 1
         
-        return {
+        self.slices[key] = {
             "location": {
                 "start": start,
                 "end": end,
                 "length": length
             },
-            "region": {
-                "name": self.chromosome,
-                "code": "chromosome",
-                "topology": "linear",
-                "so_term": "SO:0001217"
-            },
-            "strand": {
-                "code": "forward",
-                "value": 1
-            }
+            "region": get_region_payload(self.chromosome),
+            "strand": FORWARD_STRAND
         }
+        return self.slices[key]
     
     
     
     def get_alleles(self) -> List:
-        variant_allele_list = []
-
-        
-        for index,alt in enumerate(self.alts):
-            if index+1 <= len(self.alts):
-                variant_allele = VariantAllele(index+1,  alt.value, self)
-                variant_allele_list.append(variant_allele)
-        reference_allele = VariantAllele(0, self.ref, self)
-        variant_allele_list.append(reference_allele)
-        return variant_allele_list
+        """
+        Builds the alt and reference VariantAlleles on first use
+        """
+        if self.variant_alleles is None:
+            variant_allele_list = [VariantAllele(index+1, alt.value, self) for index, alt in enumerate(self.alts)]
+            reference_allele = VariantAllele(0, self.ref, self)
+            variant_allele_list.append(reference_allele)
+            self.variant_alleles = variant_allele_list
+        return self.variant_alleles
     
     def get_most_severe_consequence(self) -> Mapping:
         consequence_index = self.get_info_key_index("Consequence")
-        consequence_map = {}
-        directory = os.path.dirname(__file__)
-        with open(os.path.join(directory,'variation_consequence_rank.json')) as rank_file:
-            consequence_rank = json.load(rank_file)
+        consequence_rank = CONSEQUENCE_RANK
+        most_severe_rank = most_severe_consequence = None
         for csq_record in self.info["CSQ"]:
-            csq_record_list = csq_record.split("|")
-            for cons in csq_record_list[consequence_index].split("&"):
+            consequences = csq_record.split("|", consequence_index+1)[consequence_index]
+            for cons in consequences.split("&"):
                 rank = consequence_rank[cons]
-                consequence_map[int(rank)] = cons
+                # on equal rank the last consequence seen is reported
+                if most_severe_rank is None or rank <= most_severe_rank:
+                    most_severe_rank, most_severe_consequence = rank, cons
         return{
-                    "result": consequence_map[min(consequence_map.keys())]  ,
+                    "result": most_severe_consequence,
                     "analysis_method": {
                         "tool": "Ensembl VEP",
                         "qualifier": "most severe consequence"
@@ -265,45 +372,38 @@ class Variant ():
         } 
 
     def get_gerp_score(self) -> Mapping:
-        csq_record = self.info["CSQ"]
-        csq_record_list = csq_record[0].split("|")
-        if self.get_info_key_index("Conservation") is not None:
-            gerp_index = self.get_info_key_index("Conservation") 
+        gerp_index = self.get_info_key_index("Conservation") 
+        if gerp_index is not None:
+            gerp_score = self.info["CSQ"][0].split("|", gerp_index+1)[gerp_index]
             gerp_prediction_result = {
-                    "score": csq_record_list[gerp_index] ,
+                    "score": gerp_score ,
                     "analysis_method": {
                         "tool": "GERP",
                         "qualifier": "GERP"
                     }
-                } if csq_record_list[gerp_index] else {}
+                } if gerp_score else {}
             return gerp_prediction_result
     
     def get_ancestral_allele(self) -> Mapping:
-        csq_record = self.info["CSQ"]
-        csq_record_list = csq_record[0].split("|")
-        if self.get_info_key_index("AA") is not None:
-            aa_index = self.get_info_key_index("AA")
+        aa_index = self.get_info_key_index("AA")
+        if aa_index is not None:
+            ancestral_allele = self.info["CSQ"][0].split("|", aa_index+1)[aa_index]
             aa_prediction_result = {
-                    "result": csq_record_list[aa_index] ,
+                    "result": ancestral_allele ,
                     "analysis_method": {
                         "tool": "AncestralAllele",
                         "qualifier": "",
                         "version": "110" #self.vep_version
                     }
-                } if csq_record_list[aa_index] and csq_record_list[aa_index]!="."  else {}
+                } if ancestral_allele and ancestral_allele!="."  else {}
             return aa_prediction_result
     
     def get_info_key_index(self, key: str, info_id: str ="CSQ") -> int:
             info_field = self.header.get_info_field_info(info_id).description
-            csq_list = info_field.split("Format: ")[1].split("|")
-            for index, value in enumerate(csq_list):
-                if value == key:
-                    return index   
+            return get_format_indices(info_field).get(key)
                 
     def traverse_population_info(self) -> Mapping:
-        directory = os.path.dirname(__file__)
-        with open(os.path.join(directory,'populations.json')) as pop_file:
-            pop_mapping = json.load(pop_file)
+        pop_mapping = POPULATIONS
         population_frequency_map = {}
         for csq_record in self.info["CSQ"]:
             csq_record_list = csq_record.split("|")
@@ -340,16 +440,19 @@ class Variant ():
         return population_frequency_map
     
     def set_frequency_flags(self):
+        """
+        Returns the population frequency map with MAF and HPMAF flags, calculated once
+        """
+        if self.population_map is None:
+            self.population_map = self.calculate_frequency_flags()
+        return self.population_map
+
+    def calculate_frequency_flags(self):
         """
         Calculates MAF (minor allele frequency) and  HPMAF by iterating through each allele 
         """
 
-        directory = os.path.dirname(__file__)
-        with open(os.path.join(directory,'populations.json')) as pop_file:
-            pop_mapping = json.load(pop_file)
-        pop_names = []
-        for pop in pop_mapping.values():
-            pop_names.extend([sub_pop["name"] for sub_pop in pop])
+        pop_names = POPULATION_NAMES
         hpmaf = []
         pop_frequency_map = self.traverse_population_info()
         if not pop_frequency_map:
@@ -360,6 +463,7 @@ class Variant ():
                                                  if pop_name in pop_frequency_map[pop_allele]} 
                                                  for pop_name in pop_names}
 
+        ref_allele = minimise_allele(self.ref,self.ref)
         for pop_name in pop_frequency_map_transpose:
             by_population = []
             for pop_allele,pop_allele_freq in pop_frequency_map_transpose[pop_name].items():     
@@ -367,7 +471,6 @@ class Variant ():
             if not len(by_population):
                 continue
             ## Add population frequency for reference allele
-            ref_allele = minimise_allele(self.ref,self.ref)
             allele_frequency_ref = 1 - float(sum(list(zip(*by_population))[0]))
             if allele_frequency_ref <= 1 and allele_frequency_ref >= 0:
                 population_frequency_ref = {
@@ -12,15 +12,47 @@
    limitations under the License.
 """
 
-from typing import Any, Mapping, List, Union, Tuple
+from typing import Any, Mapping, List, Sequence, Union, Tuple
 import re
 import os
 import json
-import operator
-from functools import reduce
 from common.file_model.utils import minimise_allele
 
+LOWERCASE_BASES_PATTERN = re.compile(r"[a-z]")
+SIFT_POLYPHEN_RESULTS = frozenset([
+    'probably damaging',
+    'possibly damaging',
+    'benign',
+    'unknown',
+    'tolerated',
+    'deleterious',
+    'tolerated - low confidence',
+    'deleterious - low confidence',
+])
+NO_PREDICTION_RESULTS = ()
+# transcript consequences are not reported for records carrying any of these
+NON_TRANSCRIPT_CONSEQUENCES = frozenset([
+    "downstream_gene_variant",
+    "upstream_gene_variant",
+    "intergenic_variant",
+    "regulatory_region_variant",
+    "TF_binding_site_variant",
+])
+
+class AlleleInfo():
+    __slots__ = ("phenotype_assertions", "predicted_molecular_consequences", "prediction_results",
+                 "prediction_tools")
+
+    def __init__(self) -> None:
+        self.phenotype_assertions = []
+        self.predicted_molecular_consequences = []
+        self.prediction_results = []
+        self.prediction_tools = set()
+
 class VariantAllele():
+    __slots__ = ("name", "variant", "allele_index", "alt", "type", "allele_sequence",
+                 "reference_sequence", "population_map", "min_alt", "allele_info")
+
     def __init__(self, allele_index: str, alt: str, variant:dict) -> None:
         
         self.name = f"{variant.chromosome}:{variant.position}:{variant.ref}:{alt}"
@@ -31,7 +63,8 @@ class VariantAllele():
         self.allele_sequence = alt
         self.reference_sequence = variant.ref
         self.population_map = []
-        self.info_map = self.traverse_csq_info()
+        self.min_alt = minimise_allele(alt, variant.ref)
+        self.allele_info = self.traverse_csq_info()
 
     def get_allele_type(self):
         #TODO: change this to VariantAllele level
@@ -45,89 +78,79 @@ class VariantAllele():
         return self.variant.get_slice(self.alt)
     
     def get_phenotype_assertions(self):
-        min_alt = minimise_allele(self.alt, self.reference_sequence)
-        return self.info_map[min_alt]["phenotype_assertions"] if min_alt in self.info_map else []
+        return self.allele_info.phenotype_assertions if self.allele_info is not None else []
 
     def get_predicted_molecular_consequences(self):
-        ## compute info_map only for these methods, first check if non-empty and compute only then
-        min_alt = minimise_allele(self.alt, self.reference_sequence)
-        return self.info_map[min_alt]["predicted_molecular_consequences"] if min_alt in self.info_map else []
+        return self.allele_info.predicted_molecular_consequences if self.allele_info is not None else []
     
     def get_prediction_results(self):
-        min_alt = minimise_allele(self.alt, self.reference_sequence)
-        return self.info_map[min_alt]["prediction_results"] if min_alt in self.info_map else []
+        return self.allele_info.prediction_results if self.allele_info is not None else []
     
     def get_population_allele_frequencies(self):
-        min_alt = minimise_allele(self.alt, self.reference_sequence)
         population_map = self.variant.set_frequency_flags()
-        return population_map[min_alt].values() if min_alt in population_map else []
+        return population_map[self.min_alt].values() if self.min_alt in population_map else []
 
     def get_web_display_data(self) -> Mapping:
         return self.variant.get_statistics_info()[self.allele_sequence]
     
-    def traverse_csq_info(self) -> Mapping:
+    def traverse_csq_info(self) -> Union[AlleleInfo, None]:
         """
-        This function is to traverse the CSQ record and extract columns
-        corresponding to Consequence, SIFT, PolyPhen, CADD
+        Extracts this allele's consequences and predictions from the CSQ records, or None if it has none
         """
-        column_list = ["Allele", "PHENOTYPES", "Feature_type", "Feature", "Consequence",
-                        "SIFT", "PolyPhen", "SPDI", "CADD_PHRED","Conservation", "Gene", "SYMBOL",
-                        "BIOTYPE","cDNA_position", "CDS_position", "Protein_position", "Amino_acids", "Codons"]
-        prediction_index_map = {}
-        for col in column_list:
-                if self.variant.get_info_key_index(col) is not None:
-                    prediction_index_map[col.lower()] = self.variant.get_info_key_index(col) 
+        prediction_index_map = self.variant.get_csq_index_map()
+        allele_index = prediction_index_map["allele"]
+        # fields past the last column we read are left unsplit in the tail
+        max_split = max(prediction_index_map.values()) + 1
+        phenotypes_index = prediction_index_map.get("phenotypes")
+        create_phenotype_assertion = self.create_allele_phenotype_assertion
+        create_predicted_molecular_consequence = self.create_allele_predicted_molecular_consequence
+        create_prediction_results = self.create_allele_prediction_results
+        min_alt = self.min_alt
 
-        info_map = {}
+        allele_info = None
         for csq_record in self.variant.info["CSQ"]:
-            csq_record_list = csq_record.split("|")
-            allele = csq_record_list[prediction_index_map["allele"]]
+            csq_record_list = csq_record.split("|", max_split)
+            allele = csq_record_list[allele_index]
+            # records for the other alts of this variant are handled by their own VariantAllele
+            if allele != min_alt:
+                continue
 
-            if allele not in info_map.keys():
-                info_map[allele] = {"phenotype_assertions": [], "predicted_molecular_consequences": [], "prediction_results": []} 
+            if allele_info is None:
+                allele_info = AlleleInfo()
 
             # parse and form phenotypes - adding phenotype from any of the csq record would be enough for adding only variant-linked phenotypes
-            if not info_map[allele]["phenotype_assertions"]:
-                phenotypes = csq_record_list[prediction_index_map["phenotypes"]].split("&") if "phenotypes" in prediction_index_map.keys() else []   
+            if not allele_info.phenotype_assertions:
+                phenotypes = csq_record_list[phenotypes_index].split("&") if phenotypes_index is not None else []   
                 for phenotype in phenotypes:
-                    phenotype_assertions = self.create_allele_phenotype_assertion(phenotype) if phenotype else []
+                    phenotype_assertions = create_phenotype_assertion(phenotype) if phenotype else []
                     if (phenotype_assertions):
-                        info_map[allele]["phenotype_assertions"].append(phenotype_assertions)
+                        allele_info.phenotype_assertions.append(phenotype_assertions)
             
             # parse and form molecular consequences
-            predicted_molecular_consequences = self.create_allele_predicted_molecular_consequence(csq_record_list, prediction_index_map)
+            predicted_molecular_consequences = create_predicted_molecular_consequence(csq_record_list, prediction_index_map)
             if (predicted_molecular_consequences):
-                info_map[allele]["predicted_molecular_consequences"].append(predicted_molecular_consequences)
+                allele_info.predicted_molecular_consequences.append(predicted_molecular_consequences)
             
             # parse and form prediction results
-            current_prediction_results = info_map[allele]["prediction_results"] 
-            info_map[allele]["prediction_results"] += self.create_allele_prediction_results(current_prediction_results, csq_record_list, prediction_index_map)
-        return info_map
+            allele_info.prediction_results.extend(create_prediction_results(allele_info.prediction_tools, csq_record_list, prediction_index_map))
+        return allele_info
      
-    def create_allele_prediction_results(self, current_prediction_results: Mapping, csq_record: List, prediction_index_map: dict) -> list:
-        prediction_results = []
-        if "cadd_phred" in prediction_index_map.keys():
-            if not self.prediction_result_already_exists(current_prediction_results, "CADD"):
-                cadd_prediction_result = {
-                        "score": csq_record[prediction_index_map["cadd_phred"]] ,
-                        "analysis_method": {
-                            "tool": "CADD",
-                            "qualifier": "CADD"
-                        }
-
-                } if csq_record[prediction_index_map["cadd_phred"]] else None
-                if cadd_prediction_result:
-                    prediction_results.append(cadd_prediction_result)
+    def create_allele_prediction_results(self, prediction_tools: set, csq_record: List, prediction_index_map: dict) -> Sequence:
+        cadd_index = prediction_index_map.get("cadd_phred")
+        # most records add nothing, either no CADD score or CADD already reported for the allele
+        if cadd_index is None or "CADD" in prediction_tools or not csq_record[cadd_index]:
+            return NO_PREDICTION_RESULTS
 
-        
-        return prediction_results
-    
-    def prediction_result_already_exists(self, current_prediction_results: Mapping, tool: str) -> bool:
-        for prediction_result in current_prediction_results:
-            if prediction_result["analysis_method"]["tool"] == tool:
-                return True
-
-        return False
+        prediction_tools.add("CADD")
+        return [
+            {
+                "score": csq_record[cadd_index] ,
+                "analysis_method": {
+                    "tool": "CADD",
+                    "qualifier": "CADD"
+                }
+            }
+        ]
     
     def parse_position(self, position: str)->Tuple:
         position_list  = position.split("-")
@@ -148,15 +171,9 @@ class VariantAllele():
         feature_type = csq_record[prediction_index_map["feature_type"]]
         consequences_list = []
         if "consequence" in prediction_index_map.keys():
-            for cons in csq_record[prediction_index_map["consequence"]].split("&"):
-                if cons in ["downstream_gene_variant", "upstream_gene_variant", "intergenic_variant", "regulatory_region_variant", "TF_binding_site_variant"]:
-                    consequences_list = []
-                    break
-                consequences_list.append(
-                    {
-                        "value": cons
-                    }
-                )
+            consequences = csq_record[prediction_index_map["consequence"]].split("&")
+            if NON_TRANSCRIPT_CONSEQUENCES.isdisjoint(consequences):
+                consequences_list = [{"value": cons} for cons in consequences]
 
         prediction_results = []
         if "sift" in prediction_index_map.keys():
@@ -207,8 +224,8 @@ class VariantAllele():
             cdna_start, cdna_end, cdna_length = self.parse_position(cdna_position)
             if (cdna_start != None and cdna_end != None):
                 if codons:
-                    ref_cdna_sequence = re.sub('([a-z])','',codons.split("/")[0]) 
-                    alt_cdna_sequence = re.sub('([a-z])','',codons.split("/")[1])
+                    ref_cdna_sequence = LOWERCASE_BASES_PATTERN.sub('',codons.split("/")[0]) 
+                    alt_cdna_sequence = LOWERCASE_BASES_PATTERN.sub('',codons.split("/")[1])
                     
                 else:
                     # TODO: Handle when strand is reverse
@@ -279,28 +296,22 @@ class VariantAllele():
 
     
     def format_sift_polyphen_output(self, output: str) -> tuple:
-        try:
-            (result, score) = re.split(r"[()]", output)[:2]
-        except:
+        (result, separator, remainder) = output.partition("(")
+        if not separator:
             return (None, None)
+        score = remainder.partition(")")[0]
 
-        if result not in [
-            'probably damaging',
-            'possibly damaging',
-            'benign',
-            'unknown',
-            'tolerated',
-            'deleterious',
-            'tolerated - low confidence',
-            'deleterious - low confidence',
-        ]:
+        if result not in SIFT_POLYPHEN_RESULTS:
             result = None
 
-        try:
-            score = float(score)
-        except:
-            # need to log something here
+        if not score:
             score = None
+        else:
+            try:
+                score = float(score)
+            except ValueError:
+                # need to log something here
+                score = None
 
         return (result, score)
     
@@ -318,7 +329,7 @@ class VariantAllele():
             return None
 
         if not feature_type:
-            if re.search("^rs", feature_id):
+            if feature_id.startswith("rs"):
                 feature_type = "Variation"  
             else:
                 feature_type = None
@@ -0,0 +1,139 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common.file_client import FileClient
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "a7335667-93e7-11ec-a39d-005056b38ce3")
+GENOMES = ("genome_1", "genome_2", "genome_3")
+
+
+@pytest.fixture
+def data_root(tmp_path):
+    for genome in GENOMES:
+        shutil.copytree(DATA_DIR, tmp_path / genome)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def file_client(data_root):
+    return FileClient({"data_root": data_root})
+
+
+def datafile(data_root, genome_uuid):
+    return os.path.join(data_root, genome_uuid, "variation.vcf.gz")
+
+
+def names(variants):
+    return [variant.name if variant is not None else None for variant in variants]
+
+
+def test_get_variant_records_keeps_order(file_client):
+    variant_ids = ["2:178454479:rs745471025", "1:10123:rs1639546401", "1:10123:rs1639546360",
+                   "1:10116:rs1639546252"]
+    variants = file_client.get_variant_records("genome_1", variant_ids)
+    assert names(variants) == ["rs745471025", "rs1639546401", "rs1639546360", "rs1639546252"]
+
+
+def test_get_variant_records_duplicate_ids(file_client):
+    variants = file_client.get_variant_records("genome_1", ["1:10123:rs1639546401", "1:10123:rs1639546401"])
+    assert names(variants) == ["rs1639546401", "rs1639546401"]
+    assert variants[0] is variants[1]
+
+
+def test_get_variant_records_not_found(file_client):
+    variant_ids = ["rs1639546401", "1:pos:rs1639546401", "1:10123:rs1639546401\n", "Y:10123:rs1639546401",
+                   "1:10123:rs1", "1:10124:rs1639546401", "1:10123:rs1639546401"]
+    variants = file_client.get_variant_records("genome_1", variant_ids)
+    assert names(variants) == [None, None, None, None, None, None, "rs1639546401"]
+
+
+def test_get_variant_record(file_client):
+    assert file_client.get_variant_record("genome_1", "1:10116:rs1639546252").name == "rs1639546252"
+    assert file_client.get_variant_record("genome_1", "1:10116:rs1") is None
+
+
+def test_cached_variant_is_reused(file_client):
+    first = file_client.get_variant_record("genome_1", "1:10116:rs1639546252")
+    second = file_client.get_variant_record("genome_1", "1:10116:rs1639546252")
+    assert first is second
+
+
+def test_changed_file_is_reopened(file_client, data_root):
+    path = datafile(data_root, "genome_1")
+    first = file_client.get_variant_record("genome_1", "1:10116:rs1639546252")
+    _, first_tabix, _ = file_client._get_reader(path)
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    second = file_client.get_variant_record("genome_1", "1:10116:rs1639546252")
+    _, second_tabix, _ = file_client._get_reader(path)
+
+    assert not first_tabix.is_open()
+    assert second_tabix is not first_tabix
+    assert second is not first
+    assert second.name == first.name
+
+
+def test_readers_are_evicted(file_client):
+    file_client.MAX_OPEN_READERS = 1
+    for genome_uuid in GENOMES + GENOMES:
+        variant = file_client.get_variant_record(genome_uuid, "1:10116:rs1639546252")
+        assert variant.name == "rs1639546252"
+        assert len(file_client._readers) == 1
+
+
+def test_reader_evicted_before_it_is_locked(file_client, data_root):
+    file_client.MAX_OPEN_READERS = 1
+    get_reader = file_client._get_reader
+    evicted = []
+
+    def get_reader_then_evict(path):
+        handles = get_reader(path)
+        if not evicted:
+            # another thread opens a different file between _get_reader and the lock
+            evicted.append(get_reader(datafile(data_root, "genome_2")))
+        return handles
+
+    file_client._get_reader = get_reader_then_evict
+    variant = file_client.get_variant_record("genome_1", "1:10116:rs1639546252")
+    assert variant.name == "rs1639546252"
+
+
+def test_concurrent_access_with_eviction(file_client):
+    file_client.MAX_OPEN_READERS = 1
+    file_client.MAX_CACHED_VARIANTS = 1
+    variant_ids = ["1:10116:rs1639546252", "1:10123:rs1639546401", "2:178454479:rs745471025"]
+
+    def load(index):
+        return file_client.get_variant_records(GENOMES[index % len(GENOMES)], variant_ids)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(load, range(96)))
+    assert all(names(variants) == ["rs1639546252", "rs1639546401", "rs745471025"] for variants in results)
+
+
+def test_missing_index(file_client, data_root):
+    os.remove(datafile(data_root, "genome_1") + ".tbi")
+    variants = file_client.get_variant_records("genome_1", ["1:10116:rs1639546252", "1:10123:rs1639546401"])
+    assert variants == [None, None]
+    assert not file_client._readers
+
+
+def test_missing_genome(file_client):
+    assert file_client.get_variant_records("unknown_genome", ["1:10116:rs1639546252"]) == [None]
@@ -11,13 +11,15 @@
    See the License for the specific language governing permissions and
    limitations under the License.
 """
-from typing import Dict, Callable
+from functools import lru_cache
+from typing import Any, Dict, Callable
 
 import ariadne
-from graphql import GraphQLSchema
+from graphql import DocumentNode, GraphQLSchema, parse
 from starlette.requests import Request
 from ariadne import ScalarType
 
+from graphql_service.resolver.data_loaders import BatchLoaders
 from graphql_service.resolver.variant_model import (
     QUERY_TYPE,
     VARIANT_TYPE,
@@ -38,6 +40,21 @@ def prepare_executable_schema() -> GraphQLSchema:
     )
 
 
+@lru_cache(maxsize=256)
+def parse_query_document(query: str) -> DocumentNode:
+    """
+    Parses a query string, reusing recently parsed documents
+    """
+    return parse(query)
+
+
+def cached_query_parser(context_value: Any, data: Dict) -> DocumentNode:
+    """
+    Query parser for Ariadne that reuses documents from parse_query_document
+    """
+    return parse_query_document(data["query"])
+
+
 def prepare_context_provider(context: Dict) -> Callable[[Request], Dict]:
     """
     Returns function for injecting context to graphql executors.
@@ -55,6 +72,7 @@ def prepare_context_provider(context: Dict) -> Callable[[Request], Dict]:
         return {
             "request": request,
             "file_client": file_client,
+            "loaders": BatchLoaders(file_client),
         }
 
     return context_provider
@@ -0,0 +1,53 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+import logging
+from typing import List, Tuple
+
+from aiodataloader import DataLoader
+
+logger = logging.getLogger(__name__)
+
+class BatchLoaders:
+    """
+    DataLoaders for a single GraphQL request
+    """
+
+    def __init__(self, file_client):
+        self.file_client = file_client
+        self.variant_loader = DataLoader(batch_load_fn=self.batch_variant_load)
+
+    async def batch_variant_load(self, keys: List[Tuple[str, str]]) -> List:
+        """
+        Loads variants for (genome_uuid, variant_id) keys with one file client call per genome
+        """
+        variant_ids_by_genome = {}
+        for genome_uuid, variant_id in keys:
+            variant_ids_by_genome.setdefault(genome_uuid, []).append(variant_id)
+
+        # each genome has its own datafile, so they can be read concurrently
+        loop = asyncio.get_running_loop()
+        genome_records = await asyncio.gather(*(
+            loop.run_in_executor(None, self.file_client.get_variant_records, genome_uuid, variant_ids)
+            for genome_uuid, variant_ids in variant_ids_by_genome.items()
+        ), return_exceptions=True)
+
+        variants = {}
+        for (genome_uuid, variant_ids), records in zip(variant_ids_by_genome.items(), genome_records):
+            if isinstance(records, Exception):
+                logger.error("Failed to load variants for genome %s", genome_uuid, exc_info=records)
+                records = [None] * len(variant_ids)
+            variants.update(zip(((genome_uuid, variant_id) for variant_id in variant_ids), records))
+
+        return [variants[key] for key in keys]
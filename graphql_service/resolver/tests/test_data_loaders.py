@@ -0,0 +1,55 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+
+import pytest
+
+from graphql_service.resolver.data_loaders import BatchLoaders
+
+
+class StubFileClient:
+    """
+    Returns each variant_id as its record and fails for the "broken" genome
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def get_variant_records(self, genome_uuid, variant_ids):
+        self.calls.append((genome_uuid, list(variant_ids)))
+        if genome_uuid == "broken":
+            raise RuntimeError("cannot read variation file")
+        return [f"{genome_uuid}/{variant_id}" for variant_id in variant_ids]
+
+
+@pytest.mark.asyncio
+async def test_batch_variant_load_one_call_per_genome():
+    file_client = StubFileClient()
+    loaders = BatchLoaders(file_client)
+    keys = [("genome_1", "1:1:rs1"), ("genome_2", "1:1:rs1"), ("genome_1", "1:2:rs2")]
+
+    variants = await asyncio.gather(*(loaders.variant_loader.load(key) for key in keys))
+
+    assert variants == ["genome_1/1:1:rs1", "genome_2/1:1:rs1", "genome_1/1:2:rs2"]
+    assert sorted(file_client.calls) == [("genome_1", ["1:1:rs1", "1:2:rs2"]), ("genome_2", ["1:1:rs1"])]
+
+
+@pytest.mark.asyncio
+async def test_batch_variant_load_isolates_failing_genome():
+    loaders = BatchLoaders(StubFileClient())
+    keys = [("genome_1", "1:1:rs1"), ("broken", "1:1:rs1"), ("broken", "1:2:rs2"), ("genome_1", "1:2:rs2")]
+
+    variants = await loaders.batch_variant_load(keys)
+
+    assert variants == ["genome_1/1:1:rs1", None, None, "genome_1/1:2:rs2"]
@@ -13,6 +13,7 @@
 """
 
 from typing import Dict, Optional, List, Any
+from functools import lru_cache
 import json, os
 from ariadne import QueryType, ObjectType
 from graphql import GraphQLResolveInfo
@@ -44,8 +45,8 @@ async def resolve_variant(
         "variant_id": by_id["variant_id"],
         "genome_id": by_id["genome_id"],
     }
-    file_client = info.context["file_client"]
-    result = file_client.get_variant_record(by_id["genome_id"], by_id["variant_id"])
+    loaders = info.context["loaders"]
+    result = await loaders.variant_loader.load((by_id["genome_id"], by_id["variant_id"]))
     if not result:
         raise VariantNotFoundError(by_id["variant_id"])
     return result
@@ -174,12 +175,18 @@ def resolve_api(
 ):  # the second argument must be named `info` to avoid a NameError
     return {"api": {"major": "0", "minor": "1", "patch": "0-beta"}}
 
-@QUERY_TYPE.field("populations")
-def resolve_populations(_: None, info: GraphQLResolveInfo, genome_id: str = None) -> List: 
+@lru_cache(maxsize=None)
+def get_population_metadata() -> Dict:
+    """
+    Reads the population metadata once per process
+    """
     current_directory = os.path.dirname(__file__)
     population_metadata_file = f"{current_directory}/../../common/file_model/population_metadata.json"
     with open(population_metadata_file) as pop_file:
-            population_metadata = json.load(pop_file)
-    return population_metadata.get(genome_id,[]) 
+            return json.load(pop_file)
+
+@QUERY_TYPE.field("populations")
+def resolve_populations(_: None, info: GraphQLResolveInfo, genome_id: str = None) -> List: 
+    return get_population_metadata().get(genome_id,[]) 
 
 
@@ -15,8 +15,11 @@ import logging
 import os
 from typing import Optional
 
+import orjson
+
 from ariadne.asgi import GraphQL
 from ariadne.asgi.handlers import GraphQLHTTPHandler
+from ariadne.exceptions import HttpBadRequestError
 from ariadne.contrib.tracing.apollotracing import ApolloTracingExtension
 from ariadne.explorer import ExplorerGraphiQL, render_template, escape_default_query
 from ariadne.explorer.template import read_template
@@ -25,12 +28,15 @@ from pymongo import monitoring
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
 
 from common.logger import CommandLogger
 # from common.crossrefs import XrefResolver
 from common.file_client import FileClient
 from common.extensions import QueryExecutionTimeExtension
 from graphql_service.ariadne_app import (
+    cached_query_parser,
     prepare_executable_schema,
     prepare_context_provider,
 )
@@ -149,6 +155,22 @@ class CustomExplorerGraphiQL(ExplorerGraphiQL):
         )
 
 
+class ORJSONGraphQLHTTPHandler(GraphQLHTTPHandler):
+    """
+    GraphQL HTTP handler that uses orjson to decode requests and encode responses
+    """
+
+    async def extract_data_from_json_request(self, request: Request):
+        try:
+            return orjson.loads(await request.body())
+        except orjson.JSONDecodeError as ex:
+            raise HttpBadRequestError("Request body is not a valid JSON") from ex
+
+    async def create_json_response(self, request: Request, result: dict, success: bool) -> Response:
+        status_code = 200 if success else 400
+        return Response(orjson.dumps(result), status_code=status_code, media_type="application/json")
+
+
 APP = Starlette(debug=DEBUG_MODE, middleware=starlette_middleware)
 APP.mount(
     "/",
@@ -156,7 +178,8 @@ APP.mount(
         EXECUTABLE_SCHEMA,
         debug=DEBUG_MODE,
         context_value=CONTEXT_PROVIDER,
-        http_handler=GraphQLHTTPHandler(
+        query_parser=cached_query_parser,
+        http_handler=ORJSONGraphQLHTTPHandler(
             extensions=EXTENSIONS,
         ),
         explorer=CustomExplorerGraphiQL(),